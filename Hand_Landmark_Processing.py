@@ -1,8 +1,28 @@
-import cv2
+import time
 import mediapipe as mp
 from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
 
+NO_HAND = (False, 0, 0, 0, 0, 0, 0)
+
+def bbox_from_landmarks(hand, w, h):
+    """Pixel (x_min, y_min, x_max, y_max, z_min, z_max) via builtin min/max."""
+    # For 21 points, builtin reductions over plain lists beat any NumPy (or
+    # Numba) round trip; only the six extremes get scaled to pixels
+    xs = [lm.x for lm in hand]
+    ys = [lm.y for lm in hand]
+    zs = [lm.z for lm in hand]
+    return (int(min(xs) * w), int(min(ys) * h), int(max(xs) * w), int(max(ys) * h),
+            int(min(zs) * w), int(max(zs) * w))
+
+def extract_bbox(hand_landmarker, mp_image, h, w, ts_ms):
+    """Detect a hand in mp_image and return (has_hand, x_min, y_min, x_max, y_max, z_min, z_max) in pixels."""
+    results = hand_landmarker.detect_for_video(mp_image, ts_ms)
+    if not results.hand_landmarks:
+        return NO_HAND
+
+    return (True,) + bbox_from_landmarks(results.hand_landmarks[0], w, h)
+
 class HandLandmarkProcessor:
     def __init__(self):
         #mediapipe initialization
@@ -20,28 +40,35 @@ class HandLandmarkProcessor:
         )
         self.hand_landmarker = vision.HandLandmarker.create_from_options(options)
 
+        # mp.Image wrapping the caller's reused RGB buffer, if MediaPipe shares it
+        self._mp_image = None
+        self._mp_data = None
+        self._mp_shared = False
+
+        # VIDEO mode needs strictly increasing timestamps, even across stream reopens
+        self._last_ts = -1
+
     def close(self):
         self.hand_landmarker.close()
 
-    def process_landmarks(self, rgb_frame, frame, cap):
+    def get_mp_image(self, rgb_frame):
+        """Wrap rgb_frame for MediaPipe, reusing the last mp.Image when it shares the buffer."""
+        if rgb_frame is self._mp_data:
+            if self._mp_shared:
+                return self._mp_image
+            # Already known to copy: skip re-checking the same buffer every frame
+            return mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
+
         mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
+        # Only reuse the image if in-place writes to rgb_frame are visible through
+        # it; builds that copy the data fall back to one mp.Image per frame
+        self._mp_shared = mp_image.numpy_view().ctypes.data == rgb_frame.ctypes.data
+        self._mp_image = mp_image
+        self._mp_data = rgb_frame
+        return mp_image
 
-        results = self.hand_landmarker.detect_for_video(
-                mp_image,
-                int(cap.get(cv2.CAP_PROP_POS_MSEC))
-            )
-
-        if results.hand_landmarks:
-            h, w = frame.shape[:2]
-            hand = results.hand_landmarks[0]
-
-            x_coords = [lm.x * w for lm in hand]
-            y_coords = [lm.y * h for lm in hand]
-            z_coords = [lm.z * w for lm in hand]
-            x_min, x_max = int(min(x_coords)), int(max(x_coords))
-            y_min, y_max = int(min(y_coords)), int(max(y_coords))
-            z_min, z_max = int(min(z_coords)), int(max(z_coords))
-
-            return True, x_min, y_min, x_max, y_max, z_min, z_max
-        else:
-            return False, 0, 0, 0, 0, 0, 0
\ No newline at end of file
+    def process_landmarks(self, rgb_frame, frame):
+        ts = max(time.monotonic_ns() // 1_000_000, self._last_ts + 1)
+        self._last_ts = ts
+        h, w = frame.shape[:2]
+        return extract_bbox(self.hand_landmarker, self.get_mp_image(rgb_frame), h, w, ts)
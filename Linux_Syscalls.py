@@ -0,0 +1,105 @@
+import ctypes
+import os
+import sys
+
+# ctypes bindings for Linux syscalls the stdlib socket module doesn't expose.
+# Struct layouts follow glibc; everything degrades to None on other platforms.
+
+class iovec(ctypes.Structure):
+    _fields_ = [
+        ("iov_base", ctypes.c_void_p),
+        ("iov_len", ctypes.c_size_t),
+    ]
+
+class msghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(iovec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+class mmsghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_hdr", msghdr),
+        ("msg_len", ctypes.c_uint),
+    ]
+
+_libc = ctypes.CDLL(None, use_errno=True) if sys.platform.startswith("linux") else None
+
+_sendmmsg = getattr(_libc, "sendmmsg", None)
+if _sendmmsg is not None:
+    _sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(mmsghdr), ctypes.c_uint, ctypes.c_int]
+    _sendmmsg.restype = ctypes.c_int
+
+HAVE_SENDMMSG = _sendmmsg is not None
+
+def _raise_errno():
+    err = ctypes.get_errno()
+    raise OSError(err, os.strerror(err))
+
+def sendmmsg(sock, packets, flags=0):
+    """Send each bytes packet as its own datagram on a connected socket in one syscall.
+
+    Returns how many were sent; the kernel may stop early (e.g. full send buffer).
+    """
+    count = len(packets)
+    iovs = (iovec * count)()
+    msgs = (mmsghdr * count)()
+    for i, packet in enumerate(packets):
+        # Point straight at the bytes object's buffer; packets keeps it alive
+        iovs[i].iov_base = ctypes.cast(ctypes.c_char_p(packet), ctypes.c_void_p)
+        iovs[i].iov_len = len(packet)
+        msgs[i].msg_hdr.msg_iov = ctypes.pointer(iovs[i])
+        msgs[i].msg_hdr.msg_iovlen = 1
+
+    sent = _sendmmsg(sock.fileno(), msgs, count, flags)
+    if sent < 0:
+        _raise_errno()
+    return sent
+
+class timespec(ctypes.Structure):
+    _fields_ = [
+        ("tv_sec", ctypes.c_long),
+        ("tv_nsec", ctypes.c_long),
+    ]
+
+class itimerspec(ctypes.Structure):
+    _fields_ = [
+        ("it_interval", timespec),
+        ("it_value", timespec),
+    ]
+
+CLOCK_MONOTONIC = 1
+TFD_NONBLOCK = os.O_NONBLOCK
+TFD_CLOEXEC = getattr(os, "O_CLOEXEC", 0)
+
+_timerfd_create = getattr(_libc, "timerfd_create", None)
+_timerfd_settime = getattr(_libc, "timerfd_settime", None)
+if _timerfd_create is not None and _timerfd_settime is not None:
+    _timerfd_create.argtypes = [ctypes.c_int, ctypes.c_int]
+    _timerfd_create.restype = ctypes.c_int
+    _timerfd_settime.argtypes = [ctypes.c_int, ctypes.c_int,
+                                 ctypes.POINTER(itimerspec), ctypes.POINTER(itimerspec)]
+    _timerfd_settime.restype = ctypes.c_int
+
+HAVE_TIMERFD = _timerfd_create is not None and _timerfd_settime is not None
+
+def timerfd_periodic(period):
+    """Return a non-blocking CLOCK_MONOTONIC timerfd that becomes readable every period seconds.
+
+    Each os.read(fd, 8) returns the number of expirations since the last read.
+    """
+    fd = _timerfd_create(CLOCK_MONOTONIC, TFD_NONBLOCK | TFD_CLOEXEC)
+    if fd < 0:
+        _raise_errno()
+    sec = int(period)
+    interval = timespec(sec, int(round((period - sec) * 1e9)))
+    spec = itimerspec(interval, interval)
+    if _timerfd_settime(fd, 0, ctypes.byref(spec), None) < 0:
+        os.close(fd)
+        _raise_errno()
+    return fd
@@ -1,35 +1,94 @@
 import cv2
+import numpy as np
+import os
 import socket
 import time
 import math
-from Hand_Landmark_Processing import HandLandmarkProcessor as hlp
+import queue
+import threading
+from Hand_Landmark_Processing import HandLandmarkProcessor as hlp, NO_HAND
+
+# Keep OpenCV's own pool small; capture, MediaPipe and FFmpeg already have threads
+OPENCV_THREADS = 2
+cv2.setUseOptimized(True)
+cv2.setNumThreads(OPENCV_THREADS)
+
+# Non-blocking key poll (OpenCV 4.5+); waitKey(1) sleeps up to a timer tick
+poll_key = getattr(cv2, "pollKey", lambda: cv2.waitKey(1))
 
 # Drone info
 DRONE_IP = "192.168.1.1"
 DRONE_UDP_PORT = 7099
 RTSP_URL = "rtsp://192.168.1.1:7070/webcam"
 
+# Stream values
+# OpenCV's FFmpeg backend parses "key;value" pairs separated by "|"
+FFMPEG_CAPTURE_OPTIONS = "rtsp_transport;tcp|probesize;32|analyzeduration;0|fflags;nobuffer|flags;low_delay|max_delay;0"
+DEFAULT_STREAM_FPS = 30.0
+STALE_GRABS = 3  # max frames dropped when the capture loop falls behind
+
+# Hardware decode (NVDEC/VAAPI/D3D11/VideoToolbox) when the build supports it;
+# VIDEO_ACCELERATION_ANY falls back to software if no device is usable
+if hasattr(cv2, "CAP_PROP_HW_ACCELERATION"):
+    HW_DECODE_PARAMS = [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+else:
+    HW_DECODE_PARAMS = None
+
 # Camera switch payloads
 CAMERA_1_CMD = bytes([6, 1])
 CAMERA_2_CMD = bytes([6, 2])
 
+# Hand tracking values
+DETECT_EVERY = 2   # run MediaPipe on every Nth frame, hold the bbox in between
+BBOX_ALPHA = 0.5   # EMA weight of a new detection
+
+# Display values
+INFO_REFRESH = 0.2  # seconds between info overlay text updates
+
 # Drone control values
 DEAD_ZONE = 0.15
 MAX_VELOCITY = 100
 
+def _new_udp_socket():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    return sock
+
+# Shared command socket, reused across sends
+_SOCK = _new_udp_socket()
+
 def udp_send(raw_bytes: bytes, addr=(DRONE_IP, DRONE_UDP_PORT)):
     """Send raw bytes over UDP to the drone."""
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    global _SOCK
     try:
-        sock.sendto(raw_bytes, addr)
-    finally:
-        sock.close()
+        _SOCK.sendto(raw_bytes, addr)
+    except OSError:
+        # Socket went bad (e.g. interface reset); recreate it and retry once
+        _SOCK.close()
+        _SOCK = _new_udp_socket()
+        _SOCK.sendto(raw_bytes, addr)
+
+def _put_latest(q, item):
+    """Put item on a size-1 queue, dropping whatever stale item is waiting."""
+    try:
+        q.get_nowait()
+    except queue.Empty:
+        pass
+    try:
+        q.put_nowait(item)
+    except queue.Full:
+        pass
 
 class CameraViewer:
     def __init__(self, rtsp_url=RTSP_URL):
+        # Load the hand model first so GPU delegate failures surface before
+        # we connect to the stream or open a window
+        self.hlp = hlp()
+
         self.rtsp_url = rtsp_url
         self.cap = None
         self.is_drone = False
+        self._cap_lock = threading.Lock()
         self.open_stream()
 
         self.current_cam = 1
@@ -38,39 +97,64 @@ class CameraViewer:
         self.WINDOW_WIDTH = 640
         self.WINDOW_HEIGHT = 480
         cv2.resizeWindow(self.window_name, self.WINDOW_WIDTH, self.WINDOW_HEIGHT)
+        self._canvas = np.zeros((self.WINDOW_HEIGHT, self.WINDOW_WIDTH, 3), np.uint8)
+        self._letterbox_cache = (None, None)
 
         self.prev_time = time.time()
         self.fps = 0.0
-        
-        self.hlp = hlp()
+        self._info_text = ""
+        self._info_t = 0.0
+
+        # Pipeline queues: capture -> detect -> render, always holding the newest item
+        self._cap_q = queue.Queue(maxsize=1)
+        self._out_q = queue.Queue(maxsize=1)
+        self._stop = threading.Event()
+
+        # RGB frame handed to MediaPipe, reused while the resolution is unchanged
+        self._rgb = None
+
+        # Frame skipping state for the detector
+        self._frame_idx = 0
+        self._last_bbox = NO_HAND
 
     def open_stream(self, reopen_delay=0.3):
         """Open RTSP stream, fallback to webcam if it fails."""
-        if self.cap is not None:
-            try:
-                self.cap.release()
-            except Exception:
-                pass
-            time.sleep(reopen_delay)
+        # The capture thread grabs under this lock, so it can't touch a released cap
+        with self._cap_lock:
+            if self.cap is not None:
+                try:
+                    self.cap.release()
+                except Exception:
+                    pass
+                time.sleep(reopen_delay)
 
-        # Try drone RTSP first
-        self.cap = cv2.VideoCapture(self.rtsp_url, cv2.CAP_FFMPEG)
-        if not self.cap.isOpened():
-            time.sleep(0.2)
-            self.cap = cv2.VideoCapture(self.rtsp_url)
+            # Try drone RTSP first, with low-latency demuxer/decoder options
+            os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = FFMPEG_CAPTURE_OPTIONS
+            if HW_DECODE_PARAMS:
+                self.cap = cv2.VideoCapture(self.rtsp_url, cv2.CAP_FFMPEG, HW_DECODE_PARAMS)
+            else:
+                self.cap = cv2.VideoCapture(self.rtsp_url, cv2.CAP_FFMPEG)
+            if not self.cap.isOpened():
+                time.sleep(0.2)
+                self.cap = cv2.VideoCapture(self.rtsp_url)
 
-        if self.cap.isOpened():
-            self.is_drone = True
-            print("Connected to drone RTSP stream")
-        else:
-            # Fallback to webcam
-            print("Failed to connect to drone; falling back to webcam")
-            self.cap = cv2.VideoCapture(0)
             if self.cap.isOpened():
-                self.is_drone = False
-                print("Webcam opened successfully")
+                self.is_drone = True
+                print("Connected to drone RTSP stream")
             else:
-                raise RuntimeError("Failed to open RTSP stream and webcam")
+                # Fallback to webcam
+                print("Failed to connect to drone; falling back to webcam")
+                self.cap = cv2.VideoCapture(0)
+                if self.cap.isOpened():
+                    self.is_drone = False
+                    print("Webcam opened successfully")
+                else:
+                    raise RuntimeError("Failed to open RTSP stream and webcam")
+
+            # Keep FFmpeg's queue short so grab() returns fresh frames
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            stream_fps = self.cap.get(cv2.CAP_PROP_FPS)
+            self._frame_period = 1.0 / (stream_fps if stream_fps > 0 else DEFAULT_STREAM_FPS)
 
     def switch_camera(self):
         """Toggle between camera 1 and 2 (drone only)."""
@@ -97,16 +181,22 @@ class CameraViewer:
 
         self.current_cam = new_cam
 
-    def run(self):
-        print("Press 'c' to switch camera, 'q' to quit.")
+    def _capture_loop(self):
+        """Grab frames from the stream and hand the newest one to the detector."""
         reconnect_attempts = 0
-        MAX_RECONNECTS = 5   
-
-        while True:
-            if self.cap is None or not self.cap.isOpened():
+        MAX_RECONNECTS = 5
+        last_grab = time.time()
+
+        while not self._stop.is_set():
+            # Checked under the lock: an in-flight open_stream (camera switch)
+            # finishes first, so we only reopen a cap that is still closed
+            with self._cap_lock:
+                closed = self.cap is None or not self.cap.isOpened()
+            if closed:
                 reconnect_attempts += 1
                 if reconnect_attempts > MAX_RECONNECTS:
                     print("Too many reconnect attempts, exiting.")
+                    self._stop.set()
                     break
                 try:
                     print(f"Stream closed; attempting reconnect {reconnect_attempts}")
@@ -116,7 +206,18 @@ class CameraViewer:
                     time.sleep(0.8)
                     continue
 
-            ret, frame = self.cap.read()
+            # If we fell behind (reopen, camera switch), frames have piled up in
+            # the decoder; grab past them and only retrieve the newest one
+            now = time.time()
+            grabs = STALE_GRABS if now - last_grab > 1.5 * self._frame_period else 1
+            last_grab = now
+
+            with self._cap_lock:
+                for _ in range(grabs):
+                    ret = self.cap.grab()
+                    if not ret:
+                        break
+                frame = self.cap.retrieve()[1] if ret else None
             if not ret or frame is None:
                 time.sleep(0.05)
                 reconnect_attempts += 1
@@ -146,73 +247,134 @@ class CameraViewer:
                 except Exception:
                     pass
 
-            # Detect hands with MediaPipe
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-            has_hand, x_min, y_min, x_max, y_max, z_min, z_max = self.hlp.process_landmarks(rgb_frame, frame, self.cap)
-
-            if has_hand:
-                cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 255, 0), 2)
-                cx, cy, cz = (x_min + x_max) // 2, (y_min + y_max) // 2, z_min + z_max // 2
-                cv2.circle(frame, (cx, cy), 5, (0, 0, 255), -1)
-                cv2.putText(frame, f"Z: {cz}", (cx + 10, cy + 20),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
-                
-                # Drone control logic
-                frame_center_x, frame_center_y = frame.shape[1] // 2, frame.shape[0] // 2
-                distance = math.hypot(cx - frame_center_x, cy - frame_center_y)
-
-                if distance > DEAD_ZONE * frame.shape[0]:
-                    move_x = (cx - frame_center_x) / distance
-                    move_y = (cy - frame_center_y) / distance
-                else:
-                    move_x, move_y = 0, 0
-                
-                cv2.circle(frame, (frame_center_x, frame_center_y), round(DEAD_ZONE * frame.shape[0]), (0, 255, 0), 3)
-                cv2.arrowedLine(frame, (frame_center_x, frame_center_y), (frame_center_x + round(move_x * MAX_VELOCITY), frame_center_y + round(move_y * MAX_VELOCITY)), (255, 255, 0), 3)
-
-            # Compute FPS
-            current_time = time.time()
-            dt = current_time - self.prev_time if (current_time - self.prev_time) > 1e-6 else 1e-6
-            self.fps = 0.85 * self.fps + 0.15 * (1.0 / dt)
-            self.prev_time = current_time
-
-            # Upscale to window size while maintaining aspect ratio
-            h, w = frame.shape[:2]
-            aspect_ratio = w / h
-            window_aspect = self.WINDOW_WIDTH / self.WINDOW_HEIGHT
+            _put_latest(self._cap_q, frame)
+
+    def _detect_loop(self):
+        """Run MediaPipe on captured frames and pass the results to the renderer."""
+        while not self._stop.is_set():
+            try:
+                frame = self._cap_q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            try:
+                if self._frame_idx % DETECT_EVERY == 0:
+                    if self._rgb is None or self._rgb.shape != frame.shape:
+                        self._rgb = np.empty_like(frame)
+                    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb)
+                    landmarks = self.hlp.process_landmarks(rgb_frame, frame)
+                    self._last_bbox = self._smooth_bbox(landmarks)
+            except Exception as e:
+                print("Hand detection failed:", e)
+                self._stop.set()
+                break
+            self._frame_idx += 1
+
+            _put_latest(self._out_q, (frame, self._last_bbox))
+
+    def _smooth_bbox(self, landmarks):
+        """Blend a new detection with the previous bbox (EMA, like the FPS smoother)."""
+        prev = self._last_bbox
+        if not (landmarks[0] and prev[0]):
+            return landmarks
+        return (True,) + tuple(
+            round(BBOX_ALPHA * new + (1 - BBOX_ALPHA) * old)
+            for new, old in zip(landmarks[1:], prev[1:])
+        )
+
+    def _letterbox_geometry(self, shape):
+        """Return (new_w, new_h, y0, x0) fitting a frame of this shape into the window."""
+        if shape == self._letterbox_cache[0]:
+            return self._letterbox_cache[1]
+
+        h, w = shape
+        aspect_ratio = w / h
+        window_aspect = self.WINDOW_WIDTH / self.WINDOW_HEIGHT
+        
+        if aspect_ratio > window_aspect:
+            new_w = self.WINDOW_WIDTH
+            new_h = int(self.WINDOW_WIDTH / aspect_ratio)
+        else:
+            new_h = self.WINDOW_HEIGHT
+            new_w = int(self.WINDOW_HEIGHT * aspect_ratio)
+
+        geometry = (new_w, new_h, (self.WINDOW_HEIGHT - new_h) // 2, (self.WINDOW_WIDTH - new_w) // 2)
+        self._letterbox_cache = (shape, geometry)
+        return geometry
+
+    def _render(self, frame, landmarks):
+        """Draw the hand overlay and show the letterboxed frame."""
+        has_hand, x_min, y_min, x_max, y_max, z_min, z_max = landmarks
+
+        if has_hand:
+            cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 255, 0), 2)
+            cx, cy, cz = (x_min + x_max) // 2, (y_min + y_max) // 2, z_min + z_max // 2
+            cv2.circle(frame, (cx, cy), 5, (0, 0, 255), -1)
+            cv2.putText(frame, f"Z: {cz}", (cx + 10, cy + 20),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
             
-            if aspect_ratio > window_aspect:
-                new_w = self.WINDOW_WIDTH
-                new_h = int(self.WINDOW_WIDTH / aspect_ratio)
+            # Drone control logic
+            frame_center_x, frame_center_y = frame.shape[1] // 2, frame.shape[0] // 2
+            distance = math.hypot(cx - frame_center_x, cy - frame_center_y)
+
+            if distance > DEAD_ZONE * frame.shape[0]:
+                move_x = (cx - frame_center_x) / distance
+                move_y = (cy - frame_center_y) / distance
             else:
-                new_h = self.WINDOW_HEIGHT
-                new_w = int(self.WINDOW_HEIGHT * aspect_ratio)
+                move_x, move_y = 0, 0
             
-            frame_upscaled = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_CUBIC)
-            
-            # Center the frame on a black background
-            canvas = cv2.imread(None)
-            canvas = frame_upscaled.copy() if frame_upscaled.shape[:2] == (self.WINDOW_HEIGHT, self.WINDOW_WIDTH) else cv2.copyMakeBorder(
-                frame_upscaled,
-                (self.WINDOW_HEIGHT - new_h) // 2,
-                (self.WINDOW_HEIGHT - new_h) - (self.WINDOW_HEIGHT - new_h) // 2,
-                (self.WINDOW_WIDTH - new_w) // 2,
-                (self.WINDOW_WIDTH - new_w) - (self.WINDOW_WIDTH - new_w) // 2,
-                cv2.BORDER_CONSTANT,
-                value=(0, 0, 0)
-            )
-            frame_upscaled = canvas
-
-            # Overlay info
+            cv2.circle(frame, (frame_center_x, frame_center_y), round(DEAD_ZONE * frame.shape[0]), (0, 255, 0), 3)
+            cv2.arrowedLine(frame, (frame_center_x, frame_center_y), (frame_center_x + round(move_x * MAX_VELOCITY), frame_center_y + round(move_y * MAX_VELOCITY)), (255, 255, 0), 3)
+
+        # Compute FPS
+        current_time = time.time()
+        dt = current_time - self.prev_time if (current_time - self.prev_time) > 1e-6 else 1e-6
+        self.fps = 0.85 * self.fps + 0.15 * (1.0 / dt)
+        self.prev_time = current_time
+
+        # Upscale to window size while maintaining aspect ratio
+        new_w, new_h, y0, x0 = self._letterbox_geometry(frame.shape[:2])
+
+        # Resize straight into the centre of the preallocated black canvas
+        canvas = self._canvas
+        # Re-blank the borders, the info overlay from the last frame spills onto them
+        canvas[:y0] = 0
+        canvas[y0 + new_h:] = 0
+        canvas[:, :x0] = 0
+        canvas[:, x0 + new_w:] = 0
+        cv2.resize(frame, (new_w, new_h), dst=canvas[y0:y0 + new_h, x0:x0 + new_w],
+                   interpolation=cv2.INTER_LINEAR)
+
+        # Overlay info, text refreshed at INFO_REFRESH rather than every frame
+        if current_time - self._info_t > INFO_REFRESH:
             source = "Drone" if self.is_drone else "Webcam"
-            info_text = f"Source: {source} | Camera: {self.current_cam} | Res: {frame.shape[1]}x{frame.shape[0]} | FPS: {self.fps:.1f}"
+            self._info_text = f"Source: {source} | Camera: {self.current_cam} | Res: {frame.shape[1]}x{frame.shape[0]} | FPS: {self.fps:.1f}"
+            self._info_t = current_time
+
+        cv2.putText(canvas, self._info_text, (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
 
-            cv2.putText(frame_upscaled, info_text, (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+        cv2.imshow(self.window_name, canvas)
+
+    def run(self):
+        print("Press 'c' to switch camera, 'q' to quit.")
 
-            cv2.imshow(self.window_name, frame_upscaled)
-            key = cv2.waitKey(1) & 0xFF
+        # Capture and detection run in their own threads; this thread only renders
+        workers = [
+            threading.Thread(target=self._capture_loop, daemon=True),
+            threading.Thread(target=self._detect_loop, daemon=True),
+        ]
+        for worker in workers:
+            worker.start()
+
+        while not self._stop.is_set():
+            try:
+                frame, landmarks = self._out_q.get(timeout=0.1)
+                self._render(frame, landmarks)
+            except queue.Empty:
+                pass
+
+            key = poll_key() & 0xFF
 
             if key == ord('q'):
                 break
@@ -220,15 +382,18 @@ class CameraViewer:
                 self.switch_camera()
 
         # Cleanup
+        self._stop.set()
+        for worker in workers:
+            worker.join(timeout=2.0)
         try:
-            if self.cap is not None:
-                self.cap.release()
+            with self._cap_lock:
+                if self.cap is not None:
+                    self.cap.release()
         except Exception:
             pass
         cv2.destroyAllWindows()
         self.hlp.close()
 
-
 if __name__ == "__main__":
     try:
         viewer = CameraViewer(RTSP_URL)
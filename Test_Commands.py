@@ -1,167 +1,499 @@
+import argparse
+import asyncio
+import collections
+import logging
+import os
 import socket
+import struct
 import time
 import threading
 from enum import Enum
 
+import Linux_Syscalls
+
+try:
+    import _commands  # optional compiled builder, see _commands.pyx
+except ImportError:
+    _commands = None
+
+logger = logging.getLogger(__name__)
+
+SEND_ERROR_LOG_INTERVAL = 1.0  # seconds between repeated send error reports
+CMD_PERIOD = 0.05    # 20 Hz command repeat during takeoff/landing/stop
+HOVER_PERIOD = 0.1   # 10 Hz command repeat while hovering
+HEARTBEAT_PERIOD = 1.0
+_HEARTBEAT = b'\x01\x01'
+TX_QUEUE_LEN = 256   # packets buffered between the control thread and the IO loop
+
+# Command socket tuning. TOS 0xB8 is DSCP 46 (Expedited Forwarding), which
+# Wi-Fi WMM maps to the AC_VO voice queue; SO_PRIORITY 6 is the highest the
+# kernel allows without CAP_NET_ADMIN and picks the qdisc band
+IP_TOS_EF = 0xB8
+SOCKET_PRIORITY = 6
+SOCKET_SNDBUF = 64 * 1024
+
+# IO thread scheduling: pinned to the last CPU it may run on, SCHED_FIFO at
+# this priority. Needs CAP_SYS_NICE (or an RLIMIT_RTPRIO allowance); without it
+# the thread stays SCHED_OTHER. With CONFIG_RT_GROUP_SCHED the process's cgroup
+# also needs a cpu.rt_runtime_us budget (systemd/docker default to 0), otherwise
+# the call fails with EPERM even as root. The kernel's RT throttling
+# (sched_rt_runtime_us, 95% by default) still bounds a runaway FIFO thread
+IO_THREAD_RT_PRIORITY = 10
+
+# Flight command layouts, type-3 prefix included. 'B' fields only take 0-255.
+# Advanced: 3, 102, byte1, byte2, accelerator, turn, byte5, checksum, 153
+_ADV_FMT = struct.Struct('>9B')
+# Standard: 3, 102, 20, byte1, byte2, accelerator, turn, byte5, byte6,
+#           10 zero padding bytes, checksum, 153
+_STD_FMT = struct.Struct('>9B10x2B')
+
+# Mode flag bits packed into DroneTester._flags. Bits 0-5 and 7 are advanced
+# byte 5 as-is; unlock gets bit 6 and is folded onto bit 5 (with fast return)
+FAST_FLY = 1        # Bit 0: Fast Fly (takeoff)
+FAST_DROP = 2       # Bit 1: Fast Drop (landing)
+ESTOP = 4           # Bit 2: Emergency Stop
+CIRCLE_END = 8      # Bit 3: Circle Turn End
+NOHEAD = 16         # Bit 4: No Head Mode
+FAST_RETURN = 32    # Bit 5: Fast Return
+UNLOCK = 64         # Sent as bit 5: Unlock
+GYRO = 128          # Bit 7: Gyro Correction
+
+def _std_byte5(flags):
+    byte5 = 0
+    if flags & (FAST_FLY | FAST_DROP):
+        byte5 += 1
+    if flags & ESTOP:
+        byte5 += 2
+    if flags & GYRO:
+        byte5 += 4
+    if flags & CIRCLE_END:
+        byte5 += 8
+    return byte5
+
+# Standard protocol byte 5/6 for every flag combination, built once
+_STD_BYTE5_LUT = bytes(_std_byte5(flags) for flags in range(256))
+_STD_BYTE6_LUT = bytes(1 if flags & NOHEAD else 0 for flags in range(256))
+
+def _flag_property(bit):
+    """Boolean attribute backed by one bit of self._flags."""
+    def get(self):
+        return bool(self._flags & bit)
+    def set(self, on):
+        if on:
+            self._flags |= bit
+        else:
+            self._flags &= ~bit
+        self._cached_cmd = None
+    return property(get, set)
+
+def _control_property(slot):
+    """Control value attribute stored in the named slot; setting it drops the cached command."""
+    def get(self):
+        return getattr(self, slot)
+    def set(self, value):
+        setattr(self, slot, value)
+        self._cached_cmd = None
+    return property(get, set)
+
+class _CommandProtocol(asyncio.DatagramProtocol):
+    """Reports transport send errors back to the DroneTester."""
+    def __init__(self, tester):
+        self.tester = tester
+
+    def error_received(self, exc):
+        self.tester._on_send_error(exc)
+
 class DroneType(Enum):
     STANDARD = 1
     ADVANCED = 10
 
 class DroneTester:
-    def __init__(self, drone_ip="192.168.1.1", command_port=7099):
+    # Fixed attribute set: slot loads skip the instance dict on the hot path
+    __slots__ = (
+        "drone_ip", "command_port", "interface", "socket", "_addr",
+        "loop", "io_thread", "transport", "_heartbeat_handle", "_heartbeat_fd",
+        "_tx", "_tx_pending", "running", "_last_send_error",
+        "_accelerator", "_byte1", "_byte2", "_turn", "_flags", "_cached_cmd",
+    )
+
+    # Flight control parameters (from FlyController)
+    control_accelerator = _control_property("_accelerator")
+    control_byte1 = _control_property("_byte1")
+    control_byte2 = _control_property("_byte2")
+    control_turn = _control_property("_turn")
+
+    # Mode flags - using FastFly for takeoff and FastDrop for landing
+    is_fast_fly = _flag_property(FAST_FLY)      # Used for takeoff
+    is_fast_drop = _flag_property(FAST_DROP)    # Used for landing
+    is_emergency_stop = _flag_property(ESTOP)
+    is_gyro_correction = _flag_property(GYRO)
+    is_no_head_mode = _flag_property(NOHEAD)
+    is_fast_return = _flag_property(FAST_RETURN)
+    is_unlock = _flag_property(UNLOCK)
+    is_circle_turn_end = _flag_property(CIRCLE_END)
+
+    def __init__(self, drone_ip="192.168.1.1", command_port=7099, interface=None):
         self.drone_ip = drone_ip
         self.command_port = command_port
+        self.interface = interface  # e.g. "wlan0" to bind to the drone's Wi-Fi (Linux, needs CAP_NET_RAW)
         self.socket = None
+        self._addr = None  # sendto() fallback address when the socket isn't connected
+        # IO loop thread owning the datagram transport (see connect)
+        self.loop = None
+        self.io_thread = None
+        self.transport = None
+        self._heartbeat_handle = None
+        self._heartbeat_fd = None
+        # Single-producer/single-consumer handoff of packets from the control
+        # thread to the IO loop; full queue drops the oldest (stalest) command
+        self._tx = collections.deque(maxlen=TX_QUEUE_LEN)
+        self._tx_pending = False
         self.running = False
-        self.heartbeat_thread = None
+        self._last_send_error = float("-inf")
         
-        # Flight control parameters (from FlyController)
-        self.control_accelerator = 128  # Default center value
-        self.control_byte1 = 128
-        self.control_byte2 = 128  
-        self.control_turn = 128
+        # Flight control parameters (see the control_* properties)
+        self._accelerator = 128  # Default center value
+        self._byte1 = 128
+        self._byte2 = 128  
+        self._turn = 128
         
-        # Mode flags - using FastFly for takeoff and FastDrop for landing
-        self.is_fast_fly = False      # Used for takeoff
-        self.is_fast_drop = False     # Used for landing  
-        self.is_emergency_stop = False
-        self.is_gyro_correction = False
-        self.is_no_head_mode = False
-        self.is_fast_return = False
-        self.is_unlock = False
-        self.is_circle_turn_end = False
+        # Mode flags (see the is_* properties), all off
+        self._flags = 0
+        # Last advanced command built from the values above; any control or
+        # flag change resets it to None
+        self._cached_cmd = None
         
     def connect(self):
-        """Initialize UDP socket connection"""
+        """Initialize UDP socket connection and start the IO loop"""
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.socket.settimeout(2.0)
+            # Non-blocking: a stuck send can't stall heartbeat or command loops
+            self.socket.setblocking(False)
+            self._tune_socket()
+            # Connect the UDP socket so sends skip per-packet address parsing;
+            # keep a sendto() address only if the kernel refuses (no route yet)
+            try:
+                self.socket.connect((self.drone_ip, self.command_port))
+                self._addr = None
+            except OSError:
+                self._addr = (self.drone_ip, self.command_port)
+            self._start_io_loop()
             print(f"Connected to drone at {self.drone_ip}:{self.command_port}")
             return True
         except Exception as e:
             print(f"Connection failed: {e}")
+            self.disconnect()
             return False
+
+    def _tune_socket(self):
+        """Set low-latency socket options; ones the platform lacks are skipped"""
+        options = [
+            (socket.IPPROTO_IP, getattr(socket, "IP_TOS", None), IP_TOS_EF),
+            # After IP_TOS, which on Linux also resets the socket priority
+            (socket.SOL_SOCKET, getattr(socket, "SO_PRIORITY", None), SOCKET_PRIORITY),
+            (socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_SNDBUF),
+        ]
+        for level, option, value in options:
+            if option is None:
+                continue
+            try:
+                self.socket.setsockopt(level, option, value)
+            except OSError as e:
+                logger.debug("setsockopt(%s, %s) failed: %s", level, option, e)
+
+        if self.interface and hasattr(socket, "SO_BINDTODEVICE"):
+            # Must happen before connect(); pins traffic to the drone's interface
+            try:
+                self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_BINDTODEVICE,
+                                       self.interface.encode())
+            except OSError as e:
+                logger.warning("Could not bind to %s: %s", self.interface, e)
+
+    def _start_io_loop(self):
+        """Run an asyncio loop in a background thread that owns the datagram transport"""
+        self._tx.clear()
+        self._tx_pending = False
+        self.loop = asyncio.new_event_loop()
+        self.io_thread = threading.Thread(target=self._run_io_loop, daemon=True)
+        self.io_thread.start()
+        endpoint = self.loop.create_datagram_endpoint(
+            lambda: _CommandProtocol(self), sock=self.socket
+        )
+        self.transport, _ = asyncio.run_coroutine_threadsafe(endpoint, self.loop).result(timeout=2.0)
+
+    def _run_io_loop(self):
+        # IO thread body: settle where/how it runs before the loop takes traffic
+        self._pin_io_thread()
+        self.loop.run_forever()
+
+    def _pin_io_thread(self):
+        """Pin the calling thread to one CPU and make it SCHED_FIFO where allowed"""
+        # pid 0 means the calling thread on Linux, so only the IO thread moves
+        if hasattr(os, "sched_setaffinity"):
+            try:
+                cpu = max(os.sched_getaffinity(0))
+                os.sched_setaffinity(0, {cpu})
+            except OSError as e:
+                logger.debug("sched_setaffinity failed: %s", e)
+        if hasattr(os, "sched_setscheduler"):
+            try:
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(IO_THREAD_RT_PRIORITY))
+            except PermissionError:
+                logger.debug("SCHED_FIFO not permitted; IO thread keeps normal priority")
+            except OSError as e:
+                logger.debug("sched_setscheduler failed: %s", e)
+
+    def disconnect(self):
+        """Stop the IO loop and close the socket"""
+        if self.loop is not None:
+            if self.loop.is_running():
+                self.loop.call_soon_threadsafe(self._shutdown_io)
+                self.io_thread.join(timeout=2.0)
+            if not self.loop.is_running():
+                self.loop.close()
+        if self.socket:
+            self.socket.close()
+        self.loop = self.io_thread = self.transport = self.socket = None
+
+    def _shutdown_io(self):
+        self.running = False
+        self._cancel_heartbeat()
+        if self.transport is not None:
+            self.transport.close()
+        # close() schedules the transport's connection_lost; stop after it runs
+        self.loop.call_soon(self.loop.stop)
     
     def send_command(self, data: bytes):
-        """Send raw command to drone"""
-        if self.socket:
+        """Send raw command to drone (from any thread)"""
+        if self.transport is None:
+            return
+        if threading.current_thread() is self.io_thread:
+            self._send_now(data)
+        else:
+            # Queue immutable bytes: the batch path hands each packet's buffer
+            # to sendmmsg(), and the caller may reuse a bytearray/memoryview.
+            # memoryview() (unlike bytes()) rejects ints here, in the caller
+            if type(data) is not bytes:
+                data = memoryview(data).tobytes()
+            self._tx.append(data)
+            self._wake_tx()
+
+    def _send_now(self, data):
+        # Runs on the IO loop. While the transport has nothing queued, write
+        # straight to the socket; only would-block falls back to its buffer.
+        # Everything else is the _on_send_error slow path (transport errors
+        # arrive there too, via _CommandProtocol.error_received)
+        if self.transport.get_write_buffer_size() == 0:
             try:
-                self.socket.sendto(data, (self.drone_ip, self.command_port))
-                print(f"Sent command: {data.hex()}")
-            except Exception as e:
-                print(f"Send error: {e}")
+                if self._addr is None:
+                    self.socket.send(data)
+                else:
+                    self.socket.sendto(data, self._addr)
+            except BlockingIOError:
+                self.transport.sendto(data, self._addr)
+            except OSError as e:
+                self._on_send_error(e)
+                return
+        else:
+            self.transport.sendto(data, self._addr)
+        # Guarded so data.hex() is only built when debug logging is on
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Sent command: %s", data.hex())
+
+    def _wake_tx(self):
+        # Producer side: at most one loop wakeup outstanding, however many
+        # packets are queued behind it
+        if not self._tx_pending:
+            self._tx_pending = True
+            self.loop.call_soon_threadsafe(self._drain_tx)
+
+    def _drain_tx(self):
+        # Consumer side (IO loop). Clear the flag before draining so a packet
+        # queued mid-drain schedules a fresh wakeup instead of being stranded
+        self._tx_pending = False
+        tx = self._tx
+        packets = [tx.popleft() for _ in range(len(tx))]
+        if packets:
+            self._send_batch_now(packets)
+
+    def _send_batch_now(self, packets):
+        # Runs on the IO loop. One sendmmsg() syscall for the whole batch when the
+        # socket is connected and nothing is queued in the transport ahead of us;
+        # whatever the kernel didn't take goes through the transport one by one.
+        # A lone packet (the usual 10-20 Hz case) skips sendmmsg: building its
+        # ctypes iovec/mmsghdr costs several times a plain send()
+        sent = 0
+        if (len(packets) > 1 and Linux_Syscalls.HAVE_SENDMMSG and self._addr is None
+                and self.transport.get_write_buffer_size() == 0):
+            try:
+                sent = Linux_Syscalls.sendmmsg(self.socket, packets)
+            except BlockingIOError:
+                pass
+            except OSError as e:
+                self._on_send_error(e)
+                return
+            if sent and logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Sent %d commands in one batch", sent)
+        for data in packets[sent:]:
+            self._send_now(data)
+
+    def _on_send_error(self, exc):
+        now = time.monotonic()
+        if now - self._last_send_error >= SEND_ERROR_LOG_INTERVAL:
+            self._last_send_error = now
+            logger.warning("Send error: %s", exc)
     
     def start_heartbeat(self):
         """Start periodic heartbeat (required for drone communication)"""
         self.running = True
-        def heartbeat_loop():
-            while self.running:
-                self.send_heartbeat()
-                time.sleep(1)  # Send heartbeat every second
-        self.heartbeat_thread = threading.Thread(target=heartbeat_loop, daemon=True)
-        self.heartbeat_thread.start()
+        self.loop.call_soon_threadsafe(self._start_heartbeat_timer)
         print("Heartbeat started")
     
     def stop_heartbeat(self):
-        """Stop heartbeat thread"""
+        """Stop heartbeat"""
         self.running = False
-        if self.heartbeat_thread:
-            self.heartbeat_thread.join(timeout=2.0)
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self._cancel_heartbeat)
         print("Heartbeat stopped")
+
+    def _start_heartbeat_timer(self):
+        # Runs on the IO loop. On Linux a CLOCK_MONOTONIC timerfd wakes the loop
+        # exactly on each period; elsewhere fall back to call_at deadlines
+        self._cancel_heartbeat()
+        if not self.running:
+            return
+        self.send_heartbeat()
+        if Linux_Syscalls.HAVE_TIMERFD:
+            try:
+                self._heartbeat_fd = Linux_Syscalls.timerfd_periodic(HEARTBEAT_PERIOD)
+            except OSError as e:
+                # e.g. EMFILE or a seccomp-blocked syscall; the heartbeat is
+                # required, so keep it going on call_at deadlines instead
+                logger.warning("timerfd unavailable (%s); using loop timer for heartbeat", e)
+            else:
+                self.loop.add_reader(self._heartbeat_fd, self._on_heartbeat_timer)
+                return
+        deadline = self.loop.time() + HEARTBEAT_PERIOD
+        self._heartbeat_handle = self.loop.call_at(deadline, self._heartbeat_tick, deadline)
+
+    def _on_heartbeat_timer(self):
+        try:
+            os.read(self._heartbeat_fd, 8)  # expiration count; clears readiness
+        except BlockingIOError:
+            return
+        self.send_heartbeat()
+
+    def _heartbeat_tick(self, deadline):
+        # Rescheduled against fixed deadlines so it doesn't drift
+        if not self.running:
+            return
+        self.send_heartbeat()
+        deadline += HEARTBEAT_PERIOD
+        self._heartbeat_handle = self.loop.call_at(deadline, self._heartbeat_tick, deadline)
+
+    def _cancel_heartbeat(self):
+        if self._heartbeat_handle is not None:
+            self._heartbeat_handle.cancel()
+            self._heartbeat_handle = None
+        if self._heartbeat_fd is not None:
+            self.loop.remove_reader(self._heartbeat_fd)
+            os.close(self._heartbeat_fd)
+            self._heartbeat_fd = None
     
     def send_heartbeat(self):
         """Send heartbeat command"""
-        heartbeat_cmd = bytes([1, 1])
-        self.send_command(heartbeat_cmd)
+        self.send_command(_HEARTBEAT)
     
     def build_flight_command(self, device_type=DroneType.ADVANCED.value):
         """Build flight control command based on current state"""
-        # Calculate control byte 5 (mode flags)
-        byte5 = 0
-        if self.is_fast_fly:
-            byte5 += 1      # Bit 0: Fast Fly (takeoff)
-        if self.is_fast_drop:
-            byte5 += 2      # Bit 1: Fast Drop (landing)
-        if self.is_emergency_stop:
-            byte5 += 4      # Bit 2: Emergency Stop
-        if self.is_circle_turn_end:
-            byte5 += 8      # Bit 3: Circle Turn End
-        if self.is_no_head_mode:
-            byte5 += 16     # Bit 4: No Head Mode
-        if self.is_fast_return or self.is_unlock:
-            byte5 += 32     # Bit 5: Fast Return / Unlock
-        if self.is_gyro_correction:
-            byte5 += 128    # Bit 7: Gyro Correction
-        
+        if device_type == DroneType.ADVANCED.value:
+            return self.build_advanced()
+        return self.build_standard()
+
+    def _clamp_controls(self):
+        """Clamp control values; returns (byte1, byte2, accelerator byte, turn)"""
+        # Work on locals (LOAD_FAST) and store back to self once, only when a
+        # value actually changed - in range is every call from the UI
+        b1 = self._byte1
+        b2 = self._byte2
+        acc = self._accelerator
+        turn = self._turn
+
         # Clamp control values to valid range (1-255)
-        self.control_turn = max(1, min(255, self.control_turn))
-        self.control_byte1 = max(1, min(255, self.control_byte1))
-        self.control_byte2 = max(1, min(255, self.control_byte2))
-        
-        if self.control_accelerator == 1:
-            self.control_accelerator = 0
+        if 1 <= b1 <= 255 and 1 <= b2 <= 255 and 1 <= turn <= 255 and acc != 1:
+            return b1, b2, acc & 0xFF, turn
+        if not 1 <= turn <= 255:
+            turn = 1 if turn < 1 else 255
+        if not 1 <= b1 <= 255:
+            b1 = 1 if b1 < 1 else 255
+        if not 1 <= b2 <= 255:
+            b2 = 1 if b2 < 1 else 255
+        if acc == 1:
+            acc = 0
+        # Clamped values build the same packets, so the cached command stays valid
+        self._byte1 = b1
+        self._byte2 = b2
+        self._accelerator = acc
+        self._turn = turn
+        return b1, b2, acc & 0xFF, turn
+
+    def build_advanced(self) -> bytes:
+        """Build advanced drone protocol command (8 bytes, prefixed with type 3)"""
+        b1, b2, acc, turn = self._clamp_controls()
+        flags = self._flags
+        if _commands is not None:
+            return _commands.build_advanced(b1, b2, acc, turn, flags)
+
+        # Calculate control byte 5 (mode flags): the flag bits, with unlock
+        # (bit 6) moved onto the shared Fast Return / Unlock bit 5
+        byte5 = (flags & ~UNLOCK) | ((flags >> 1) & FAST_RETURN)
         
         # Calculate checksum
-        checksum = (self.control_byte1 ^ self.control_byte2 ^ 
-                   self.control_accelerator ^ self.control_turn ^ (byte5 & 255))
+        checksum = b1 ^ b2 ^ acc ^ turn ^ byte5
         
-        if device_type == DroneType.ADVANCED.value:
-            # Advanced drone protocol (8-byte command)
-            command_data = bytes([
-                102,  # Byte 0: Fixed value
-                self.control_byte1 & 0xFF,
-                self.control_byte2 & 0xFF, 
-                self.control_accelerator & 0xFF,
-                self.control_turn & 0xFF,
-                byte5 & 0xFF,
-                checksum & 0xFF,
-                153   # Byte 7: Fixed value
-            ])
-            # Prefix with command type 3 for flight control
-            full_command = bytes([3]) + command_data
-        else:
-            # Standard drone protocol (20-byte command)
-            byte5_std = 0
-            if self.is_fast_fly or self.is_fast_drop:
-                byte5_std += 1
-            if self.is_emergency_stop:
-                byte5_std += 2
-            if self.is_gyro_correction:
-                byte5_std += 4
-            if self.is_circle_turn_end:
-                byte5_std += 8
-            
-            byte6_std = 0
-            if self.is_no_head_mode:
-                byte6_std += 1
-            
-            checksum_std = (byte5_std ^ 
-                           (self.control_byte2 ^ self.control_byte1 ^ 
-                            self.control_accelerator ^ self.control_turn) ^ 
-                           (byte6_std & 255))
-            
-            command_data = bytes([
-                102, 20,  # Byte 0-1: Fixed values
-                self.control_byte1 & 0xFF,
-                self.control_byte2 & 0xFF,
-                self.control_accelerator & 0xFF, 
-                self.control_turn & 0xFF,
-                byte5_std & 0xFF,
-                byte6_std & 0xFF,
-                # Padding bytes
-                0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
-                checksum_std & 0xFF,
-                153  # Byte 19: Fixed value
-            ])
-            full_command = bytes([3]) + command_data
+        return _ADV_FMT.pack(3, 102, b1, b2, acc, turn, byte5, checksum, 153)
+
+    def build_standard(self) -> bytes:
+        """Build standard drone protocol command (20 bytes, prefixed with type 3)"""
+        b1, b2, acc, turn = self._clamp_controls()
+        flags = self._flags
+        byte5_std = _STD_BYTE5_LUT[flags]
+        byte6_std = _STD_BYTE6_LUT[flags]
         
-        return full_command
+        checksum_std = byte5_std ^ (b2 ^ b1 ^ acc ^ turn) ^ byte6_std
+        
+        return _STD_FMT.pack(
+            3, 102, 20,
+            b1, b2, acc, turn,
+            byte5_std, byte6_std,
+            checksum_std,
+            153
+        )
     
     def send_flight_command(self):
         """Send current flight control command"""
-        command = self.build_flight_command()
+        # Repeat loops resend the same bytes object until a control or flag changes
+        command = self._cached_cmd
+        if command is None:
+            command = self._cached_cmd = self.build_advanced()
         self.send_command(command)
     
+    def repeat_flight_command(self, duration, period=CMD_PERIOD):
+        """Send the current flight command every period seconds for duration seconds"""
+        # Sleep to fixed monotonic deadlines so send time doesn't stretch the period
+        now = time.monotonic()
+        end = now + duration
+        next_t = now
+        while now < end:
+            self.send_flight_command()
+            next_t += period
+            now = time.monotonic()
+            if next_t > now:
+                time.sleep(next_t - now)
+                now = time.monotonic()
+            else:
+                next_t = now  # overran a whole period; don't burst to catch up
+    
     def takeoff_fast_fly(self):
         """Takeoff using isFastFly flag"""
         print("Initiating takeoff using FastFly...")
@@ -172,10 +504,7 @@ class DroneTester:
         print("FastFly takeoff command sent")
         
         # Keep sending command for a short duration
-        start_time = time.time()
-        while time.time() - start_time < 1.0:  # Send for 1 second
-            self.send_flight_command()
-            time.sleep(0.05)
+        self.repeat_flight_command(1.0)  # Send for 1 second
         
         # Reset FastFly flag
         self.is_fast_fly = False
@@ -192,10 +521,7 @@ class DroneTester:
         print("FastDrop landing command sent")
         
         # Keep sending command for a short duration
-        start_time = time.time()
-        while time.time() - start_time < 1.5:  # Send for 1.5 seconds (longer for landing)
-            self.send_flight_command()
-            time.sleep(0.05)
+        self.repeat_flight_command(1.5)  # Send for 1.5 seconds (longer for landing)
         
         # Reset FastDrop flag
         self.is_fast_drop = False
@@ -221,15 +547,13 @@ class DroneTester:
     
     def emergency_stop(self):
         """Send emergency stop command using isEmergencyStop flag"""
-        print("EMERGENCY STOP!")
         self.is_emergency_stop = True
         self.send_flight_command()
+        # Packet first, then one unbuffered write - no formatting or stdout lock
+        os.write(2, b"ESTOP\n")
         
         # Keep emergency stop active for 1 second
-        start_time = time.time()
-        while time.time() - start_time < 1.0:
-            self.send_flight_command()
-            time.sleep(0.05)
+        self.repeat_flight_command(1.0)
         
         self.is_emergency_stop = False
         self.send_flight_command()
@@ -266,10 +590,7 @@ class DroneTester:
             print(f"Hovering for {flight_duration} seconds...")
             
             # Send hover commands periodically during flight
-            hover_start = time.time()
-            while time.time() - hover_start < flight_duration:
-                self.send_flight_command()
-                time.sleep(0.1)  # Send commands every 100ms
+            self.repeat_flight_command(flight_duration, HOVER_PERIOD)
             
             # Step 5: Land using FastDrop
             self.land_fast_drop()
@@ -282,18 +603,18 @@ class DroneTester:
             return True
             
         except KeyboardInterrupt:
-            print("\nTest interrupted by user")
+            # Stop the drone before reporting anything
             self.emergency_stop()
+            print("\nTest interrupted by user")
             return False
         except Exception as e:
-            print(f"Test failed with error: {e}")
             self.emergency_stop()
+            print(f"Test failed with error: {e}")
             return False
         finally:
             # Cleanup
             self.stop_heartbeat()
-            if self.socket:
-                self.socket.close()
+            self.disconnect()
             print("Connection closed")
 
     def test_individual_fast_commands(self):
@@ -323,8 +644,7 @@ class DroneTester:
             
         finally:
             self.stop_heartbeat()
-            if self.socket:
-                self.socket.close()
+            self.disconnect()
 
     def test_quick_tap_commands(self):
         """Test quick tap-style commands (like the original Java implementation)"""
@@ -359,27 +679,40 @@ class DroneTester:
             
         finally:
             self.stop_heartbeat()
-            if self.socket:
-                self.socket.close()
+            self.disconnect()
 
 def main():
     """Main test function"""
-    tester = DroneTester()
+    parser = argparse.ArgumentParser(description="FastFly/FastDrop drone command tester")
+    parser.add_argument("--mode", type=int, choices=[1, 2, 3, 4],
+                        help="test to run; prompts for one when omitted")
+    parser.add_argument("--duration", type=float, default=5.0,
+                        help="hover time in seconds for mode 1 (default: 5.0)")
+    parser.add_argument("--ip", default="192.168.1.1", help="drone address")
+    parser.add_argument("--port", type=int, default=7099, help="drone command port")
+    args = parser.parse_args()
+
+    # Per-packet logging is DEBUG; keep it off for flight so sends stay cheap
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    tester = DroneTester(args.ip, args.port)
     
     print("=== DRONE FASTFLY/FASTDROP TESTER ===")
     print("Using isFastFly flag for takeoff and isFastDrop for landing")
     print()
-    print("Choose test mode:")
-    print("1. Complete FastFly/FastDrop sequence (5 second hover)")
-    print("2. Individual FastFly/FastDrop command test") 
-    print("3. Quick-tap command test (button press simulation)")
-    print("4. Emergency stop test")
-    
-    choice = input("Enter choice (1-4): ").strip()
+    if args.mode is None:
+        print("Choose test mode:")
+        print(f"1. Complete FastFly/FastDrop sequence ({args.duration:g} second hover)")
+        print("2. Individual FastFly/FastDrop command test") 
+        print("3. Quick-tap command test (button press simulation)")
+        print("4. Emergency stop test")
+        
+        choice = input("Enter choice (1-4): ").strip()
+    else:
+        choice = str(args.mode)
     
     if choice == "1":
         # Complete sequence test
-        success = tester.test_fastfly_fastdrop_sequence(flight_duration=5)
+        success = tester.test_fastfly_fastdrop_sequence(flight_duration=args.duration)
         if success:
             print("✅ FastFly/FastDrop test completed successfully!")
         else:
@@ -408,6 +741,7 @@ def main():
             time.sleep(2)
             tester.emergency_stop()
             tester.stop_heartbeat()
+            tester.disconnect()
             print("✅ Emergency stop test completed!")
         else:
             print("❌ Failed to connect for emergency stop test!")
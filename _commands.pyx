@@ -0,0 +1,37 @@
+# cython: language_level=3
+"""C flight command builder for Test_Commands.DroneTester.
+
+Build in place with:  cythonize -i _commands.pyx
+Test_Commands uses its pure-Python builder when this module isn't compiled.
+"""
+from cpython.bytes cimport PyBytes_FromStringAndSize
+
+# Same bits as Test_Commands.FAST_RETURN / UNLOCK
+cdef enum:
+    FAST_RETURN = 32
+    UNLOCK = 64
+
+cdef inline unsigned char clamp_control(long v):
+    return 255 if v > 255 else (1 if v < 1 else <unsigned char>v)
+
+cpdef bytes build_advanced(long b1, long b2, unsigned char acc, long turn, unsigned char flags):
+    """Advanced flight command (type-3 prefix + 8 bytes) from control values and mode flags.
+
+    byte1, byte2 and turn are clamped to 1-255 here; acc must already be a byte.
+    """
+    b1 = clamp_control(b1)
+    b2 = clamp_control(b2)
+    turn = clamp_control(turn)
+    cdef unsigned char byte5 = (flags & ~UNLOCK) | ((flags >> 1) & FAST_RETURN)
+    cdef unsigned char buf[9]
+    buf[0] = 3
+    buf[1] = 102
+    buf[2] = <unsigned char>b1
+    buf[3] = <unsigned char>b2
+    buf[4] = acc
+    buf[5] = <unsigned char>turn
+    buf[6] = byte5
+    # Checksum folds the five payload bytes straight out of the packed buffer
+    buf[7] = buf[2] ^ buf[3] ^ buf[4] ^ buf[5] ^ buf[6]
+    buf[8] = 153
+    return PyBytes_FromStringAndSize(<char *>buf, 9)